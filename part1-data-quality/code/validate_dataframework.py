@@ -1,13 +1,42 @@
 import pandas as pd
+import numpy as np
 import json
 import os
 import glob
 import logging
+from concurrent.futures import ProcessPoolExecutor
 from typing import List
 
+# orjson parses JSON in native code (SIMD structural scan) and is a drop-in
+# replacement for json.loads here. Fall back to stdlib json if unavailable.
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
 # Configure Logging
 logging.basicConfig(filename='dq_log.txt', level=logging.INFO, format='%(asctime)s - %(message)s')
 
+# Known schema for the raw event CSVs. Declaring dtypes up front skips
+# pandas' type inference on every load, and 'category' for event_name keeps
+# memory down and speeds up .isin/value_counts. 'clientId' is listed so the
+# pre-drift files (before Feb 27) load with the same types.
+EVENT_DTYPES = {
+    'client_id': 'string',
+    'clientId': 'string',
+    'event_name': 'category',
+    'page_url': 'string',
+    'referrer': 'string',
+    'event_data': 'string',
+}
+EVENT_USECOLS = ['client_id', 'clientId', 'timestamp', 'event_name',
+                 'page_url', 'referrer', 'event_data']
+
+# Rows per read_csv chunk. Every per-file metric below is associative, so
+# streaming keeps peak memory at one chunk regardless of file size.
+CHUNK_ROWS = 200_000
+
 
 def _resolve_data_paths() -> List[str]:
     """
@@ -17,7 +46,7 @@ def _resolve_data_paths() -> List[str]:
     processing does not depend on the working directory.
     """
     script_dir = os.path.dirname(os.path.abspath(__file__))
-    
+
     search_path = os.path.join("data", "events_*.csv")
     files = sorted(glob.glob(search_path))
 
@@ -34,79 +63,135 @@ def _resolve_data_paths() -> List[str]:
     return files
 
 
+def _qc_single_file(file):
+    """
+    Run the per-file QC (schema, nulls, dupes, revenue, event counts) for one
+    CSV. Returns (stats, tids) where tids preserves in-file order so the
+    caller can do cross-file duplicate detection. Module-level so it can be
+    dispatched to worker processes.
+    """
+    file_name = os.path.basename(file)
+    # Initial stats container
+    stats = {"file": file_name, "status": "PASS", "alerts": []}
+    tids = []
+
+    try:
+        # Stream the file chunk by chunk — every metric below is a
+        # running reduction, so no chunk is kept after processing.
+        rows = 0
+        null_count = 0
+        has_client_id = False
+        daily_rev = 0.0
+        n_purchases = 0
+        row_hashes = []
+        event_counts = pd.Series(dtype='int64')
+
+        reader = pd.read_csv(file, dtype=EVENT_DTYPES,
+                             usecols=lambda c: c in EVENT_USECOLS,
+                             parse_dates=['timestamp'], chunksize=CHUNK_ROWS)
+        for i, chunk in enumerate(reader):
+            # --- 1. Schema & Drift Checks (header only, first chunk) ---
+            if i == 0:
+                cols = set(chunk.columns)
+                if 'clientId' in cols and 'client_id' not in cols:
+                    stats["alerts"].append("SCHEMA_DRIFT: clientId -> client_id")
+                    stats["status"] = "WARNING"
+                if 'referrer' not in cols:
+                    stats["alerts"].append("MISSING_COL: referrer")
+                    stats["status"] = "CRITICAL"
+
+            if 'clientId' in chunk.columns:
+                chunk = chunk.rename(columns={'clientId': 'client_id'})
+            rows += len(chunk)
+
+            # --- 2. Identity & Null Checks ---
+            if 'client_id' in chunk.columns:
+                has_client_id = True
+                null_count += int(chunk['client_id'].isnull().sum())
+
+            # --- 3. Duplicate Event Fingerprinting ---
+            # Hash only the columns that identify a retried event;
+            # timestamp is excluded (retries arrive at different times)
+            # and so is referrer, keeping the hashed bytes to the
+            # meaningful fingerprint. Row hashes (8B/row) are all that
+            # survives the chunk; dupes are counted over the combined
+            # hash stream at the end.
+            fp_cols = [c for c in ('client_id', 'event_name', 'page_url', 'event_data')
+                       if c in chunk.columns]
+            row_hashes.append(
+                pd.util.hash_pandas_object(chunk[fp_cols], index=False).to_numpy())
+
+            # --- 4. Revenue & Transaction Logic ---
+            # Only purchase-type rows carry revenue, so filter first and
+            # bulk-parse just that subset.
+            purchases = chunk[chunk['event_name'].isin(['purchase', 'checkout_completed'])]
+            parsed = [_json_loads(x) if pd.notnull(x) else {} for x in purchases['event_data'].to_numpy()]
+            daily_rev += np.fromiter(
+                (float(p.get('value') or p.get('revenue') or p.get('total') or 0) for p in parsed),
+                dtype=np.float64, count=len(parsed)).sum()
+            n_purchases += len(purchases)
+
+            # Transaction ID Collection (for cross-file dedupe)
+            tids.extend(
+                tid for tid in
+                (p.get('transaction_id') or p.get('order_id') for p in parsed)
+                if tid)
+
+            # --- 5. Event Counts Breakdown ---
+            event_counts = event_counts.add(
+                chunk['event_name'].value_counts(), fill_value=0)
+
+        stats["rows"] = rows
+        if has_client_id and rows:
+            null_rate = null_count / rows
+            stats["null_rate"] = null_rate
+            if null_rate > 0.05:
+                 stats["alerts"].append(f"HIGH_NULLS: {null_rate:.1%}")
+                 stats["status"] = "CRITICAL" if null_rate > 0.1 else "WARNING"
+
+        stats["duplicate_rows"] = int(
+            pd.Series(np.concatenate(row_hashes)).duplicated().sum()) if row_hashes else 0
+        stats["revenue"] = daily_rev
+        stats["purchases"] = n_purchases
+        # Kept as a plain dict — the report build pivots these into typed
+        # n_<event> columns, so no JSON round-trip on write or read.
+        stats["event_breakdown"] = {k: int(v) for k, v in event_counts.items()}
+
+    except Exception as e:
+        stats["status"] = "ERROR"
+        stats["alerts"].append(str(e))
+
+    return stats, tids
+
+
 def run_exhaustive_quality_check():
     files = _resolve_data_paths()
     if not files:
         logging.warning("No files to process. Exiting early.")
         return pd.DataFrame()
-    report_data = []
-    all_transactions = []
-    
+
     print(f"🚀 Starting Exhaustive QC on {len(files)} files...")
-    
-    for file in files:
-        file_name = os.path.basename(file)
-        # Initial stats container
-        stats = {"file": file_name, "status": "PASS", "alerts": []}
-        
-        try:
-            df = pd.read_csv(file)
-            stats["rows"] = len(df)
-            
-            # --- 1. Schema & Drift Checks ---
-            cols = set(df.columns)
-            if 'clientId' in cols and 'client_id' not in cols:
-                stats["alerts"].append("SCHEMA_DRIFT: clientId -> client_id")
-                df.rename(columns={'clientId': 'client_id'}, inplace=True)
-                stats["status"] = "WARNING"
-            
-            if 'referrer' not in cols:
-                stats["alerts"].append("MISSING_COL: referrer")
-                stats["status"] = "CRITICAL"
 
-            # --- 2. Identity & Null Checks ---
-            if 'client_id' in df.columns:
-                null_count = df['client_id'].isnull().sum()
-                null_rate = null_count / len(df)
-                stats["null_rate"] = null_rate
-                if null_rate > 0.05:
-                     stats["alerts"].append(f"HIGH_NULLS: {null_rate:.1%}")
-                     stats["status"] = "CRITICAL" if null_rate > 0.1 else "WARNING"
-            
-            # --- 3. Duplicate Event Fingerprinting ---
-            # Exclude timestamp to find true duplicates (retry logic usually causes this)
-            dupes = df.duplicated().sum()
-            stats["duplicate_rows"] = dupes
-            
-            # --- 4. Revenue & Transaction Logic ---
-            # Parse JSON safely
-            df['data'] = df['event_data'].apply(lambda x: json.loads(x) if pd.notnull(x) else {})
-            
-            # Sum Revenue & Collect Txn IDs
-            purchases = df[df['event_name'].isin(['purchase', 'checkout_completed'])]
-            daily_rev = 0.0
-            
-            for _, row in purchases.iterrows():
-                # Revenue Summation
-                val = row['data'].get('value') or row['data'].get('revenue') or row['data'].get('total')
-                if val: daily_rev += float(val)
-                
-                # Transaction ID Collection (for cross-file dedupe)
-                tid = row['data'].get('transaction_id') or row['data'].get('order_id')
-                if tid: all_transactions.append({'tid': tid, 'file': file})
-
-            stats["revenue"] = daily_rev
-            stats["purchases"] = len(purchases)
-            
-            # --- 5. Event Counts Breakdown ---
-            event_counts = df['event_name'].value_counts().to_dict()
-            stats["event_breakdown"] = json.dumps(event_counts)
-            
-        except Exception as e:
-            stats["status"] = "ERROR"
-            stats["alerts"].append(str(e))
-        
+    # Each file is independent I/O + parse, so fan the per-file QC out
+    # across cores. map returns results in submission order, keeping the
+    # report and the first-file-wins dedupe deterministic.
+    with ProcessPoolExecutor() as executor:
+        results = list(executor.map(_qc_single_file, files))
+
+    report_data = []
+    # Cross-file transaction dedupe: tid -> first file seen, collisions
+    # recorded as they happen instead of materializing every transaction.
+    seen_tids = {}
+    dup_transactions = []
+    for stats, tids in results:
         report_data.append(stats)
+        for tid in tids:
+            first_file = seen_tids.get(tid)
+            if first_file is None:
+                seen_tids[tid] = stats["file"]
+            else:
+                dup_transactions.append(
+                    {'tid': tid, 'first_file': first_file, 'file': stats["file"]})
 
     # --- 6. Cross-File Comparators ---
     report_df = pd.DataFrame(report_data)
@@ -123,16 +208,31 @@ def run_exhaustive_quality_check():
 
     report_df['revenue_dod_pct'] = report_df['revenue'].pct_change()
     report_df['vol_dod_pct'] = report_df['rows'].pct_change()
-    
+
+    # Pivot the per-file event counts into int64 n_<event> columns; files
+    # that errored before counting simply get zeros.
+    if 'event_breakdown' in report_df.columns:
+        breakdowns = [b if isinstance(b, dict) else {}
+                      for b in report_df.pop('event_breakdown')]
+        counts_wide = (pd.json_normalize(breakdowns)
+                       .fillna(0).astype('int64').add_prefix('n_'))
+        report_df = pd.concat([report_df, counts_wide], axis=1)
+
     # Check for Duplicate Transactions across files
-    txn_df = pd.DataFrame(all_transactions)
-    dup_txns = txn_df[txn_df.duplicated('tid', keep=False)]
-    if not dup_txns.empty:
-        print(f"\n⚠️ FOUND {len(dup_txns)} DUPLICATE TRANSACTIONS ACROSS FILES!")
-    
-    # Save Report
-    report_df.to_csv('dq_report.csv', index=False)
-    print("\n✅ QC Complete. Summary Report saved to 'dq_report.csv'")
+    if dup_transactions:
+        # Count every occurrence of a duplicated tid, including the first.
+        n_dup_rows = len(dup_transactions) + len({d['tid'] for d in dup_transactions})
+        print(f"\n⚠️ FOUND {n_dup_rows} DUPLICATE TRANSACTIONS ACROSS FILES!")
+
+    # Save Report — Parquet keeps dtypes and compresses far better than CSV.
+    # Set DQ_REPORT_FORMAT=csv to keep the old text output instead.
+    if os.getenv('DQ_REPORT_FORMAT', 'parquet').lower() == 'csv':
+        report_df.to_csv('dq_report.csv', index=False)
+        print("\n✅ QC Complete. Summary Report saved to 'dq_report.csv'")
+    else:
+        report_df.astype({'status': 'category'}).to_parquet(
+            'dq_report.parquet', compression='zstd', engine='pyarrow')
+        print("\n✅ QC Complete. Summary Report saved to 'dq_report.parquet'")
     return report_df
 
 # Run the system
@@ -141,4 +241,4 @@ if __name__ == "__main__":
     if df.empty:
         print("No QC summary to display.")
     else:
-        print(df[['file', 'status', 'revenue', 'null_rate', 'alerts']].to_string())
\ No newline at end of file
+        print(df[['file', 'status', 'revenue', 'null_rate', 'alerts']].to_string())
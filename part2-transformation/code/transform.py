@@ -5,10 +5,30 @@ import glob
 import os
 from datetime import timedelta
 
+# orjson decodes JSON in native code; fall back to stdlib json if missing.
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
 # 1. SETUP
 ATTRIBUTION_WINDOW_DAYS = 7
 INACTIVITY_TIMEOUT_MINS = 30
 
+# Known schema for the raw event CSVs — declaring dtypes skips pandas'
+# type inference pass on every file. 'clientId' covers the pre-drift files.
+EVENT_DTYPES = {
+    'client_id': 'string',
+    'clientId': 'string',
+    'event_name': 'category',
+    'page_url': 'string',
+    'referrer': 'string',
+    'event_data': 'string',
+}
+EVENT_USECOLS = ['client_id', 'clientId', 'timestamp', 'event_name',
+                 'page_url', 'referrer', 'event_data']
+
 def run_transformation():
     # --- STEP 1: LOAD & CLEAN (Bronze) ---
     files = sorted(glob.glob("./data/events_*.csv"))
@@ -17,7 +37,9 @@ def run_transformation():
     all_events = []
     for file in files:
         try:
-            df = pd.read_csv(file)
+            df = pd.read_csv(file, dtype=EVENT_DTYPES,
+                             usecols=lambda c: c in EVENT_USECOLS,
+                             parse_dates=['timestamp'])
             # Fix Schema Drift (Feb 27)
             if 'clientId' in df.columns: df.rename(columns={'clientId': 'client_id'}, inplace=True)
             # Fix Missing Referrer (Mar 04)
@@ -29,85 +51,127 @@ def run_transformation():
     if not all_events: return
     
     master_df = pd.concat(all_events, ignore_index=True)
-    master_df['timestamp'] = pd.to_datetime(master_df['timestamp'])
     master_df.drop_duplicates(inplace=True)
     master_df = master_df[master_df['client_id'].notnull()] # Filter Ghost Users
 
     # --- STEP 2: SESSIONIZE (Silver) ---
-    def classify_channel(row):
-        url = str(row.get('page_url', '')).lower()
-        ref = str(row.get('referrer', '')).lower()
-        
-        # Channel Logic
-        if 'utm_medium=cpc' in url or 'utm_medium=paid' in url: return 'Paid Search'
-        if 'utm_source=facebook' in url or 'utm_source=instagram' in url: return 'Paid Social'
-        if 'utm_medium=email' in url: return 'Email'
-        if 'google.' in ref: return 'Organic Search'
-        if 'facebook.' in ref or 't.co' in ref: return 'Organic Social'
-        if ref == 'nan' or ref == '': return 'Direct'
-        return 'Referral'
-
-    master_df['derived_channel'] = master_df.apply(classify_channel, axis=1)
+    def classify_channel(df):
+        # Event logs repeat the same landing pages and referrers heavily, so
+        # memoize per unique value: factorize each column and run the pattern
+        # scans over the uniques only, then fan the results back out by code.
+        url_codes, url_uniques = pd.factorize(df['page_url'].fillna('').str.lower())
+        ref_codes, ref_uniques = pd.factorize(df['referrer'].fillna('').str.lower())
+        url = pd.Series(url_uniques)
+        ref = pd.Series(ref_uniques)
+
+        # Fused pattern matching: one utm-param extract pass over the URL and
+        # one combined alternation over the referrer, instead of a
+        # str.contains scan per rule. np.select keeps the rule precedence.
+        medium = url.str.extract(r'utm_medium=([^&]+)', expand=False)
+        source = url.str.extract(r'utm_source=([^&]+)', expand=False)
+        ref_match = ref.str.extract(r'(?P<search>google\.)|(?P<social>facebook\.|t\.co)')
+
+        u_cpc = medium.str.startswith(('cpc', 'paid'), na=False).to_numpy()
+        u_social = source.str.startswith(('facebook', 'instagram'), na=False).to_numpy()
+        u_email = medium.str.startswith('email', na=False).to_numpy()
+        r_search = ref_match['search'].notna().to_numpy()
+        r_social = ref_match['social'].notna().to_numpy()
+        r_direct = (ref == '').to_numpy()
+
+        return np.select(
+            [u_cpc[url_codes], u_social[url_codes], u_email[url_codes],
+             r_search[ref_codes], r_social[ref_codes], r_direct[ref_codes]],
+            ['Paid Search', 'Paid Social', 'Email', 'Organic Search', 'Organic Social', 'Direct'],
+            default='Referral')
+
+    master_df['derived_channel'] = classify_channel(master_df)
     
-    # Session Logic
+    # Session Logic — once sorted by (client_id, timestamp), boundaries fall
+    # out of plain NumPy on the factorized client codes; no GroupBy objects
+    # get built for the diff or the cumsum.
     master_df.sort_values(['client_id', 'timestamp'], inplace=True)
-    master_df['time_diff'] = master_df.groupby('client_id')['timestamp'].diff().dt.total_seconds() / 60
-    master_df['is_new_session'] = (master_df['time_diff'] > INACTIVITY_TIMEOUT_MINS) | (master_df['time_diff'].isnull())
-    master_df['session_id'] = master_df['client_id'].astype(str) + '_S' + master_df.groupby('client_id')['is_new_session'].cumsum().astype(str)
-    
+    n = len(master_df)
+    codes, _ = pd.factorize(master_df['client_id'])
+    ts = master_df['timestamp'].to_numpy(dtype='datetime64[ns]').view('i8')
+
+    new_client = np.ones(n, dtype=bool)
+    new_client[1:] = codes[1:] != codes[:-1]
+    gap_mins = np.full(n, np.inf)
+    gap_mins[1:] = (ts[1:] - ts[:-1]) / 6e10
+    gap_mins[new_client] = np.inf  # a client's first event always opens a session
+    is_new_session = gap_mins > INACTIVITY_TIMEOUT_MINS
+
+    # Keep the session key as (client_id, session_num) — grouping on an int32
+    # counter is far cheaper than building a '<client>_S<n>' string per row,
+    # and downstream only ever needs client_id + session times anyway.
+    # Per-client counter = global cumsum rebased at each client's first row.
+    session_idx = np.cumsum(is_new_session)
+    starts = np.flatnonzero(new_client)
+    run_lengths = np.diff(np.append(starts, n))
+    master_df['session_num'] = (
+        session_idx - np.repeat(session_idx[starts] - 1, run_lengths)).astype('int32')
+
     # Create Silver Table
-    silver_sessions = master_df.groupby('session_id').agg({
-        'client_id': 'first',
+    silver_sessions = master_df.groupby(['client_id', 'session_num']).agg({
         'timestamp': ['min', 'max'],
         'event_name': 'count',
         'derived_channel': 'first' # First Touch Attribution
     }).reset_index()
-    silver_sessions.columns = ['session_id', 'client_id', 'session_start', 'session_end', 'events', 'channel']
+    silver_sessions.columns = ['client_id', 'session_num', 'session_start', 'session_end', 'events', 'channel']
     
     # --- STEP 3: ATTRIBUTE (Gold) ---
     conversions = master_df[master_df['event_name'].isin(['purchase', 'checkout_completed'])].copy()
     
-    # Extract Revenue
-    def parse_rev(x):
+    # Extract Revenue — bulk-parse event_data for just the conversion subset
+    # instead of a per-row apply that builds a Series each call.
+    parsed = []
+    for x in conversions['event_data'].to_numpy():
         try:
-            d = json.loads(x)
-            return pd.Series([float(d.get('value') or d.get('revenue') or 0), d.get('transaction_id')])
-        except: return pd.Series([0.0, None])
-        
-    conversions[['revenue', 'transaction_id']] = conversions['event_data'].apply(parse_rev)
+            parsed.append(_json_loads(x))
+        except (TypeError, ValueError):
+            parsed.append({})
+    conversions['revenue'] = np.fromiter(
+        (float(d.get('value') or d.get('revenue') or 0) for d in parsed),
+        dtype=np.float64, count=len(parsed))
+    conversions['transaction_id'] = [d.get('transaction_id') for d in parsed]
     conversions = conversions[conversions['revenue'] > 0].sort_values('timestamp').drop_duplicates('transaction_id')
     
-    attribution_rows = []
-    for _, conv in conversions.iterrows():
-        # 7-Day Window Lookback
-        lookback = conv['timestamp'] - timedelta(days=ATTRIBUTION_WINDOW_DAYS)
-        mask = (silver_sessions['client_id'] == conv['client_id']) & \
-               (silver_sessions['session_start'] < conv['timestamp']) & \
-               (silver_sessions['session_start'] >= lookback)
-        
-        user_sessions = silver_sessions[mask].sort_values('session_start')
-        
-        if not user_sessions.empty:
-            attribution_rows.append({
-                'transaction_id': conv['transaction_id'],
-                'revenue': conv['revenue'],
-                'first_click': user_sessions.iloc[0]['channel'],
-                'last_click': user_sessions.iloc[-1]['channel']
-            })
-        else:
-            attribution_rows.append({
-                'transaction_id': conv['transaction_id'],
-                'revenue': conv['revenue'],
-                'first_click': 'Unattributed',
-                'last_click': 'Unattributed'
-            })
-            
-    gold_attribution = pd.DataFrame(attribution_rows)
+    # 7-Day Window Lookback via merge_asof: two sorted joins replace the
+    # per-conversion boolean mask over every session.
+    conversions = conversions.reset_index(drop=True)  # already timestamp-sorted
+    session_cols = silver_sessions[['client_id', 'session_start', 'channel']].sort_values('session_start')
+
+    # Last click: latest session starting strictly before the conversion,
+    # within the attribution window.
+    last_click = pd.merge_asof(
+        conversions[['client_id', 'timestamp']], session_cols,
+        left_on='timestamp', right_on='session_start', by='client_id',
+        direction='backward', allow_exact_matches=False,
+        tolerance=pd.Timedelta(days=ATTRIBUTION_WINDOW_DAYS))
+
+    # First click: earliest session on/after the window start; it must also
+    # begin before the conversion itself to count.
+    window_start = conversions['timestamp'] - timedelta(days=ATTRIBUTION_WINDOW_DAYS)
+    first_click = pd.merge_asof(
+        conversions[['client_id']].assign(window_start=window_start), session_cols,
+        left_on='window_start', right_on='session_start', by='client_id',
+        direction='forward')
+    first_valid = first_click['session_start'] < conversions['timestamp']
+
+    gold_attribution = pd.DataFrame({
+        'transaction_id': conversions['transaction_id'],
+        'revenue': conversions['revenue'],
+        'first_click': first_click['channel'].where(first_valid, 'Unattributed'),
+        'last_click': last_click['channel'].fillna('Unattributed'),
+    })
     
-    # Save Files
-    silver_sessions.to_csv('puffy_transformed_sessions.csv', index=False)
-    gold_attribution.to_csv('puffy_transformed_attribution.csv', index=False)
-    print("Success! Saved 'puffy_transformed_sessions.csv' and 'puffy_transformed_attribution.csv'")
+    # Save Files — Parquet preserves datetime/int dtypes so downstream reads
+    # skip re-inference, and zstd shrinks the files several-fold vs CSV.
+    silver_sessions.to_parquet('puffy_transformed_sessions.parquet',
+                               compression='zstd', engine='pyarrow')
+    gold_attribution.to_parquet('puffy_transformed_attribution.parquet',
+                                compression='zstd', engine='pyarrow')
+    print("Success! Saved 'puffy_transformed_sessions.parquet' and 'puffy_transformed_attribution.parquet'")
 
 if __name__ == "__main__":
     run_transformation()
\ No newline at end of file
@@ -5,7 +5,7 @@ This script validates the integrity of the daily ETL pipeline.
 It checks Schema, Data Quality (Nulls), and Business Logic (Revenue/Attribution).
 
 Usage:
-    python production_monitor.py --raw_dir ./data --gold_file puffy_transformed_attribution.csv --check_date 2025-03-04
+    python monitor.py --raw_dir ./data --gold_file puffy_transformed_attribution.parquet --check_date 2025-03-04
 
 Exit Codes:
     0: Success (Green/Yellow)
@@ -14,15 +14,26 @@ Exit Codes:
 """
 
 import argparse
-import glob
+import fcntl
 import os
 import json
 import sys
+import threading
 import requests
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
 
+# Polars, when importable, runs the fused daily aggregation on its
+# multithreaded lazy engine; the pandas groupby below is the fallback.
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
 # ================= CONFIGURATION =================
 # Columns that MUST exist
 REQUIRED_RAW_COLS = ['client_id', 'timestamp', 'page_url', 'referrer']
@@ -36,51 +47,173 @@ NULL_CLIENTID_THRESHOLD = 0.05 # Alert if > 5% of users are null (Ghost Users)
 REFERRER_BLACKOUT_THRESHOLD = 0.90 # Alert if > 90% of referrers are missing
 UNATTRIBUTED_SHARE_THRESHOLD = 0.40 # Alert if > 40% of revenue is Unattributed
 
+# Rate-style checks all share one shape — a metric compared against a
+# fixed threshold — so they are declared as a table and evaluated in a
+# single vectorized pass (see _check_rates). Checks with bespoke logic
+# (row volume vs rolling average, zero revenue, paid blindness) stay as
+# explicit code. Columns: metric key, threshold, severity, alert code,
+# message template, details key.
+RATE_CHECKS = [
+    ('null_cid_rate', NULL_CLIENTID_THRESHOLD, 'P1', 'GHOST_USERS',
+     'Null Client ID Rate: {value:.1%}', 'rate'),
+    ('missing_ref_rate', REFERRER_BLACKOUT_THRESHOLD, 'P0', 'REFERRER_BLACKOUT',
+     'Missing Referrer Rate: {value:.1%}', 'rate'),
+    ('unattr_share', UNATTRIBUTED_SHARE_THRESHOLD, 'P1', 'HIGH_UNATTRIBUTED',
+     'Unattributed Share is {value:.1%}', 'share'),
+]
+_RATE_THRESHOLDS = np.array([row[1] for row in RATE_CHECKS])
+
 # Slack Alerting
 SLACK_WEBHOOK = os.getenv("SLACK_WEBHOOK") # Reads from environment variable
+
+# Known schema for the raw event CSVs — declared dtypes skip pandas' type
+# inference on load. 'clientId' covers the pre-drift files (before Feb 27).
+EVENT_DTYPES = {
+    'client_id': 'string',
+    'clientId': 'string',
+    'event_name': 'category',
+    'page_url': 'string',
+    'referrer': 'string',
+    'event_data': 'string',
+}
+EVENT_USECOLS = ['client_id', 'clientId', 'timestamp', 'event_name',
+                 'page_url', 'referrer', 'event_data']
+
+# Rows per read_csv chunk when loading raw files.
+CHUNK_ROWS = 200_000
 # =================================================
 
 class ProductionMonitor:
-    def __init__(self, raw_df, gold_df, check_date=None):
-        self.raw = raw_df.copy()
-        self.gold = gold_df.copy()
-        self.alerts = [] 
+    def __init__(self, raw_df, gold_df, check_date=None, state_file=None):
+        # Plain references: the monitor only reads the inputs, and pandas'
+        # copy-on-write isolates us from the caller, so defensive .copy()
+        # would just double peak memory. Derived values (event dates etc.)
+        # live on the monitor, never written back into the frames.
+        self.raw = raw_df
+        self.gold = gold_df
+        # Alerts live as parallel typed lists rather than a list of dicts:
+        # no per-alert dict allocation on hot batch sweeps, and the artifact
+        # DataFrame builds straight from columns instead of a row transpose.
+        # The external list-of-dicts shape survives via the alerts property.
+        self._alert_cols = {'timestamp': [], 'check_date': [], 'severity': [],
+                            'code': [], 'message': [], 'details': []}
         self.status = "GREEN"
-        
+        # Optional Parquet file of per-date counters from previous runs;
+        # when set, rolling baselines come from that history so a run only
+        # needs the new day's raw rows (see _merge_state).
+        self.state_file = state_file
+        self._event_dates = None
+        self._daily_stats = None
+        self._conv_dates = None
+        self._raw_columns = None  # set when raw arrives via feed_chunk
+
         # Date Handling (Crucial for Backfills)
         if check_date:
             self.check_date = pd.to_datetime(check_date).date()
         else:
             # Default to the latest date found in the Gold data
             if 'conversion_time' in self.gold.columns:
-                self.gold['conversion_time'] = pd.to_datetime(self.gold['conversion_time'])
-                self.check_date = self.gold['conversion_time'].max().date()
+                conv_time = pd.to_datetime(self.gold['conversion_time'])
+                self._conv_dates = conv_time.dt.date
+                self.check_date = conv_time.max().date()
             else:
                 self.check_date = datetime.now().date()
 
     def _add_alert(self, severity, code, message, details=None):
         """Log an alert and upgrade system status if needed."""
-        alert = {
-            'timestamp': datetime.now().isoformat(),
-            'check_date': str(self.check_date),
-            'severity': severity,
-            'code': code,
-            'message': message,
-            'details': details or {}
-        }
-        self.alerts.append(alert)
-        
+        cols = self._alert_cols
+        cols['timestamp'].append(datetime.now().isoformat())
+        cols['check_date'].append(str(self.check_date))
+        cols['severity'].append(severity)
+        cols['code'].append(code)
+        cols['message'].append(message)
+        # Serialized once at creation — keeps the column plain strings all
+        # the way to Parquet (Arrow can't type free-form dicts anyway).
+        cols['details'].append(json.dumps(details or {}))
+
         # Logic: P0 = Critical (Red), P1 = Warning (Yellow)
         if severity == "P0":
             self.status = "RED"
         elif severity == "P1" and self.status != "RED":
             self.status = "YELLOW"
 
+    @property
+    def alerts(self):
+        """Alerts as a list of dicts — the stable shape callers and tests
+        consume; built on demand from the columnar store."""
+        cols = self._alert_cols
+        return [dict(zip(cols, row)) for row in zip(*cols.values())]
+
+    @classmethod
+    def streaming(cls, gold_df, check_date=None, state_file=None):
+        """Build a monitor that never holds raw in full. Callers push raw
+        chunks through feed_chunk() and call finalize_stream() before
+        run(); peak memory is one chunk instead of the whole event log."""
+        mon = cls(pd.DataFrame(), gold_df, check_date=check_date, state_file=state_file)
+        mon._raw_columns = set()
+        mon._stream_acc = {}
+        return mon
+
+    def feed_chunk(self, chunk):
+        """Fold one raw chunk into the per-date accumulators. Every counter
+        is an associative sum, so chunks may arrive in any order and the
+        finalized rates match the in-memory computation exactly."""
+        if 'clientId' in chunk.columns and 'client_id' not in chunk.columns:
+            chunk = chunk.rename(columns={'clientId': 'client_id'})
+        self._raw_columns.update(chunk.columns)
+
+        ts = chunk['timestamp']
+        if not pd.api.types.is_datetime64_any_dtype(ts):
+            ts = pd.to_datetime(ts, errors='coerce', utc=True, format='ISO8601')
+
+        # A chunk missing a monitored column counts as all-null for it —
+        # exactly what concat's NaN-fill yields on the in-memory path.
+        per_row = pd.DataFrame({'event_date': ts.dt.date})
+        if 'client_id' in chunk.columns:
+            per_row['null_cid'] = chunk['client_id'].isna().to_numpy()
+        else:
+            per_row['null_cid'] = True
+        if 'referrer' in chunk.columns:
+            stripped = chunk['referrer'].str.strip()
+            per_row['missing_ref'] = (stripped.isna() | (stripped == '')).to_numpy(dtype=bool)
+        else:
+            per_row['missing_ref'] = True
+        aggs = {'count': ('event_date', 'size'),
+                'null_cid': ('null_cid', 'sum'),
+                'missing_ref': ('missing_ref', 'sum')}
+
+        part = (per_row[per_row['event_date'].notna()]
+                .groupby('event_date').agg(**aggs))
+        for date, row in part.iterrows():
+            acc = self._stream_acc.setdefault(
+                date, {'count': 0, 'null_cid': 0, 'missing_ref': 0})
+            for key in aggs:
+                acc[key] += int(row[key])
+
+    def finalize_stream(self):
+        """Turn the streamed accumulators into the same daily-stats table
+        _compute_daily_stats builds, so every check runs unchanged."""
+        daily = pd.DataFrame(
+            [{'event_date': d, **acc} for d, acc in sorted(self._stream_acc.items())])
+        if daily.empty:
+            daily = pd.DataFrame({'event_date': [], 'count': []})
+        else:
+            if 'client_id' in self._raw_columns:
+                daily['null_cid_rate'] = daily.pop('null_cid') / daily['count']
+            else:
+                daily = daily.drop(columns='null_cid')
+            if 'referrer' in self._raw_columns:
+                daily['missing_ref_rate'] = daily.pop('missing_ref') / daily['count']
+            else:
+                daily = daily.drop(columns='missing_ref')
+        self._daily_stats = daily
+
     def check_schema_integrity(self):
         """Layer 1: Do the tables have the right shape?"""
-        # Check Raw
+        # Check Raw (streamed monitors track the union of chunk columns)
+        raw_cols = self._raw_columns if self._raw_columns is not None else self.raw.columns
         for c in REQUIRED_RAW_COLS:
-            if c not in self.raw.columns:
+            if c not in raw_cols:
                 self._add_alert("P0", "MISSING_RAW_COL", f"Missing Raw Column: {c}")
         
         # Check Gold
@@ -88,29 +221,129 @@ class ProductionMonitor:
             if c not in self.gold.columns:
                 self._add_alert("P0", "MISSING_GOLD_COL", f"Missing Gold Column: {c}")
 
+    def _compute_daily_stats(self):
+        """Single fused pass over raw: per-date row counts plus the null
+        client_id and missing-referrer rates. Both Layer 1 and Layer 2 read
+        from this table, so raw is scanned once instead of once per check."""
+        if self._daily_stats is not None or 'timestamp' not in self.raw.columns:
+            return
+
+        # Parse timestamps exactly once per monitor, whatever order the
+        # checks run in (or how many times run() is invoked). The explicit
+        # ISO8601 format skips pandas' per-element format inference when the
+        # loader hands us strings; Arrow/Parquet loads arrive pre-parsed.
+        ts = self.raw['timestamp']
+        if not pd.api.types.is_datetime64_any_dtype(ts):
+            ts = pd.to_datetime(ts, errors='coerce', utc=True, format='ISO8601')
+        elif ts.dt.tz is None:
+            ts = ts.dt.tz_localize('UTC')
+        self._event_dates = ts.dt.date
+
+        has_cid = 'client_id' in self.raw.columns
+        has_ref = 'referrer' in self.raw.columns
+        per_row = pd.DataFrame({'event_date': self._event_dates})
+        if has_cid:
+            per_row['client_id'] = self.raw['client_id']
+        if has_ref:
+            per_row['referrer'] = self.raw['referrer']
+
+        if pl is not None:
+            # One lazy plan: filter + groupby + all rates fuse into a single
+            # multithreaded collect.
+            exprs = [pl.len().alias('count')]
+            if has_cid:
+                exprs.append(pl.col('client_id').is_null().mean().alias('null_cid_rate'))
+            if has_ref:
+                stripped = pl.col('referrer').str.strip_chars()
+                exprs.append((stripped.is_null() | (stripped == ''))
+                             .mean().alias('missing_ref_rate'))
+            daily = (pl.from_pandas(per_row).lazy()
+                     .filter(pl.col('event_date').is_not_null())
+                     .group_by('event_date').agg(exprs)
+                     .sort('event_date').collect().to_pandas())
+            # Polars round-trips dates as Timestamps; downstream compares
+            # against datetime.date, so normalize back.
+            daily['event_date'] = daily['event_date'].dt.date
+            self._daily_stats = daily
+            return
+
+        aggs = {'count': ('event_date', 'size')}
+        if has_cid:
+            per_row['null_cid'] = per_row.pop('client_id').isna().to_numpy()
+            aggs['null_cid_rate'] = ('null_cid', 'mean')
+        if has_ref:
+            # Trim + null-check + equality; on Arrow-backed columns these
+            # dispatch to compiled utf8_trim_whitespace / equality kernels
+            # over the shared buffer, so whitespace-only referrers count as
+            # missing without a per-row Python string loop.
+            stripped = per_row.pop('referrer').str.strip()
+            per_row['missing_ref'] = (stripped.isna() | (stripped == '')).to_numpy(dtype=bool)
+            aggs['missing_ref_rate'] = ('missing_ref', 'mean')
+
+        # Event files are date-partitioned and concatenated oldest-first,
+        # so first-seen group order is almost always already chronological:
+        # skip the groupby's key sort and re-sort only when the stream
+        # really was out of order.
+        daily = (per_row.groupby('event_date', sort=False).agg(**aggs)
+                 .reset_index())
+        if not daily['event_date'].is_monotonic_increasing:
+            daily = daily.sort_values('event_date', ignore_index=True)
+        self._daily_stats = daily
+
+    def _merge_state(self, daily):
+        """Fold this run's per-date counters into the on-disk state file
+        and return the merged history, newest counters winning on date
+        collisions (backfills). The 7-day baseline is then computed over
+        this small table, so incremental runs can pass only the new day's
+        raw instead of re-scanning all history. An exclusive fcntl lock
+        held across read-merge-write keeps concurrent tenants from
+        corrupting the state."""
+        with open(self.state_file, 'a+b') as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            fh.seek(0, os.SEEK_END)
+            if fh.tell():
+                state = pd.read_parquet(self.state_file)
+                if 'state_version' in state.columns:
+                    state = (state[state['state_version'] >= _CACHE_VERSION]
+                             .drop(columns='state_version'))
+                elif 'null_cid_rate' in state.columns:
+                    # Pre-versioned rows were written by the loader that
+                    # read empty client_ids as "" and always reported a
+                    # 0.0 null rate. The row counts are sound — keep them
+                    # for the volume baseline — but void those rates; they
+                    # refill as dates are re-monitored.
+                    state = state.assign(null_cid_rate=np.nan)
+                merged = pd.concat(
+                    [state[~state['event_date'].isin(daily['event_date'])], daily],
+                    ignore_index=True).sort_values('event_date', ignore_index=True)
+            else:
+                merged = daily
+            merged.assign(state_version=_CACHE_VERSION).to_parquet(
+                self.state_file, compression='zstd', engine='pyarrow')
+        return merged
+
     def check_row_volume(self):
         """Layer 1: Did we get a normal amount of data?"""
-        if 'timestamp' not in self.raw.columns: return
+        self._compute_daily_stats()
+        if self._daily_stats is None: return
+
+        daily_counts = self._daily_stats
+        if self.state_file:
+            daily_counts = self._merge_state(daily_counts)
 
-        # Pre-process raw dates
-        self.raw['event_date'] = pd.to_datetime(self.raw['timestamp'], errors='coerce', utc=True).dt.date
-        
-        # Calculate daily counts
-        daily_counts = self.raw.groupby('event_date').size().reset_index(name='count')
-        daily_counts = daily_counts.sort_values('event_date')
-        
         # Calculate 7-Day Rolling Average (Lagged by 1 day)
         daily_counts['rolling_avg'] = daily_counts['count'].rolling(window=7, min_periods=1).mean().shift(1)
-        
-        # Get stats for the check_date
-        today_stats = daily_counts[daily_counts['event_date'] == self.check_date]
-        
-        if today_stats.empty:
+
+        # The daily table is kept date-sorted, so the check_date row is a
+        # binary search rather than an equality scan over all history.
+        dates = daily_counts['event_date'].to_numpy()
+        idx = int(np.searchsorted(dates, self.check_date))
+        if idx == len(dates) or dates[idx] != self.check_date:
             self._add_alert("P0", "NO_DATA", f"No raw rows found for date {self.check_date}")
             return
 
-        count = today_stats.iloc[0]['count']
-        avg = today_stats.iloc[0]['rolling_avg']
+        count = daily_counts['count'].iat[idx]
+        avg = daily_counts['rolling_avg'].iat[idx]
         
         # Anomaly Detection
         if pd.notna(avg) and avg > 0:
@@ -124,35 +357,51 @@ class ProductionMonitor:
         
         self.daily_counts = daily_counts # Save for artifacts
 
+    def _check_rates(self, metrics):
+        """Evaluate every RATE_CHECKS row in one branchless compare.
+        `metrics` maps metric key -> value; absent metrics become NaN and
+        can never trigger (NaN comparisons are False)."""
+        values = np.array([metrics.get(row[0], np.nan) for row in RATE_CHECKS],
+                          dtype=np.float64)
+        for i in np.flatnonzero(values > _RATE_THRESHOLDS):
+            _, _, severity, code, template, details_key = RATE_CHECKS[i]
+            self._add_alert(severity, code, template.format(value=values[i]),
+                            {details_key: float(values[i])})
+
     def check_data_quality(self):
-        """Layer 2: Nulls and Ghost Users"""
-        # Filter raw data to just the date we are checking
-        daily_raw = self.raw[self.raw['event_date'] == self.check_date].copy()
-        
-        if daily_raw.empty: return
+        """Layer 2: Nulls and Ghost Users (null client_ids, plus the
+        Mar 04 referrer blackout — empty strings and NaNs both count as
+        missing). Thresholds live in RATE_CHECKS."""
+        self._compute_daily_stats()
+        if self._daily_stats is None: return
 
-        # 1. Null Client IDs (Ghost Users)
-        if 'client_id' in daily_raw.columns:
-            null_rate = daily_raw['client_id'].isnull().mean()
-            if null_rate > NULL_CLIENTID_THRESHOLD:
-                self._add_alert("P1", "GHOST_USERS", f"Null Client ID Rate: {null_rate:.1%}", {'rate': null_rate})
+        # Same binary-search lookup as check_row_volume: the table is sorted.
+        dates = self._daily_stats['event_date'].to_numpy()
+        idx = int(np.searchsorted(dates, self.check_date))
+        if idx == len(dates) or dates[idx] != self.check_date: return
+        today = self._daily_stats.iloc[idx]
 
-        # 2. Referrer Blackout (The Mar 04 Detection)
-        if 'referrer' in daily_raw.columns:
-            # Count empty strings or NaNs as missing
-            missing = daily_raw['referrer'].replace('', np.nan).isnull().mean()
-            if missing > REFERRER_BLACKOUT_THRESHOLD:
-                self._add_alert("P0", "REFERRER_BLACKOUT", f"Missing Referrer Rate: {missing:.1%}", {'rate': missing})
+        self._check_rates({col: today[col]
+                           for col in ('null_cid_rate', 'missing_ref_rate')
+                           if col in self._daily_stats.columns})
 
     def check_business_logic(self):
         """Layer 3: The 'Puffy Rules' (Revenue & Attribution)"""
         if 'conversion_time' not in self.gold.columns: return
 
-        # Filter Gold to check_date
-        self.gold['conversion_date'] = pd.to_datetime(self.gold['conversion_time']).dt.date
-        daily_gold = self.gold[self.gold['conversion_date'] == self.check_date].copy()
-        
-        total_rev = daily_gold['revenue'].sum()
+        # Filter Gold to check_date (conversion dates parsed at most once)
+        if self._conv_dates is None:
+            self._conv_dates = pd.to_datetime(self.gold['conversion_time']).dt.date
+        daily_gold = self.gold[(self._conv_dates == self.check_date).to_numpy()]
+
+        # One groupby pass over the daily slice replaces three masked sums
+        # (total / paid / unattributed) over the revenue column. Cast to
+        # float64 once up front (lazy under copy-on-write when already
+        # float) rather than coercing inside each derived scalar.
+        revenue = daily_gold['revenue'].astype('float64')
+        by_channel = revenue.groupby(daily_gold['last_click_channel'],
+                                     observed=True, dropna=False).sum()
+        total_rev = by_channel.sum()
 
         # 1. Zero Revenue Panic
         if total_rev == 0:
@@ -160,19 +409,16 @@ class ProductionMonitor:
             return # Stop further checks if rev is 0
 
         # 2. Paid Media Blindness (The UTM Strip Check)
-        paid_rev = daily_gold[daily_gold['last_click_channel'].isin(PAID_CHANNELS)]['revenue'].sum()
-        
+        paid_rev = by_channel.reindex(PAID_CHANNELS, fill_value=0).sum()
+
         if total_rev > PAID_REV_THRESHOLD and paid_rev == 0:
-            self._add_alert("P0", "PAID_BLINDNESS", 
+            self._add_alert("P0", "PAID_BLINDNESS",
                             f"Total Rev is ${total_rev:,.0f} but Paid Channel Rev is $0. Check UTM parsing.",
                             {'total_rev': total_rev, 'paid_rev': paid_rev})
 
-        # 3. High Unattributed Rate
-        unattributed_rev = daily_gold[daily_gold['last_click_channel'] == 'Unattributed']['revenue'].sum()
-        unattr_share = unattributed_rev / total_rev
-        
-        if unattr_share > UNATTRIBUTED_SHARE_THRESHOLD:
-            self._add_alert("P1", "HIGH_UNATTRIBUTED", f"Unattributed Share is {unattr_share:.1%}", {'share': unattr_share})
+        # 3. High Unattributed Rate (threshold in RATE_CHECKS)
+        unattributed_rev = by_channel.get('Unattributed', 0.0)
+        self._check_rates({'unattr_share': unattributed_rev / total_rev})
 
     def run(self):
         print(f"--- STARTING MONITOR FOR {self.check_date} ---")
@@ -183,80 +429,301 @@ class ProductionMonitor:
         return self.status, self.alerts
 
 # ================= UTILITIES =================
+# Version stamp for the on-disk caches (Parquet sidecars and --state_file
+# rows). v2: the Arrow CSV loader now reads empty fields as nulls
+# (strings_can_be_null) — v1 sidecars have "" client_ids baked in and v1
+# state rows carry null_cid_rates computed from them, so neither can be
+# trusted.
+_CACHE_VERSION = 2
+
+_ARROW_COLUMN_TYPES = {
+    'client_id': pa.string(),
+    'clientId': pa.string(),
+    'event_name': pa.string(),
+    'page_url': pa.string(),
+    'referrer': pa.string(),
+    'event_data': pa.string(),
+}
+
+def load_raw_file(path):
+    """Read one raw events CSV with the Arrow C++ reader and normalize
+    schema drift. Only the monitored columns are parsed, and a Parquet
+    sidecar is written on first read so repeat runs over the same file
+    skip CSV parsing entirely (best-effort: read-only dirs just re-parse)."""
+    cache = f"{path[:-4]}.v{_CACHE_VERSION}.parquet"
+    if os.path.exists(cache) and os.path.getmtime(cache) >= os.path.getmtime(path):
+        return pd.read_parquet(cache, dtype_backend='pyarrow')
+
+    # Project to the columns this file actually has; include_columns errors
+    # on absent names and we must not invent a null referrer column (its
+    # absence is a schema alert, not a blackout).
+    with open(path) as fh:
+        header = fh.readline().rstrip('\n').split(',')
+    cols = [c for c in EVENT_USECOLS if c in header]
+
+    # strings_can_be_null: empty CSV fields must load as nulls, matching
+    # pandas — Arrow's default keeps them as "" and isna()-based checks
+    # (null client_ids, the exact Feb 27 failure mode) would read 0%.
+    table = pa_csv.read_csv(path, convert_options=pa_csv.ConvertOptions(
+        include_columns=cols, column_types=_ARROW_COLUMN_TYPES,
+        strings_can_be_null=True))
+    # Keep the Arrow buffers as the pandas backing store: null checks hit
+    # the validity bitmap and string kernels run in C++ instead of over
+    # per-row Python str objects.
+    df = table.to_pandas(types_mapper=pd.ArrowDtype)
+    if 'clientId' in df.columns:
+        df = df.rename(columns={'clientId': 'client_id'})
+
+    try:
+        df.to_parquet(cache, compression='zstd', engine='pyarrow')
+    except OSError:
+        pass
+    return df
+
+def iter_raw_chunks(path, chunksize=CHUNK_ROWS):
+    """Stream one raw events CSV as schema-normalized chunks, sized for
+    ProductionMonitor.feed_chunk. RSS stays bounded by the chunk size no
+    matter how large the file grows."""
+    reader = pd.read_csv(path, dtype=EVENT_DTYPES,
+                         usecols=lambda c: c in EVENT_USECOLS,
+                         parse_dates=['timestamp'], chunksize=chunksize)
+    for chunk in reader:
+        if 'clientId' in chunk.columns:
+            chunk = chunk.rename(columns={'clientId': 'client_id'})
+        yield chunk
+
 def send_slack_alert(summary, alerts):
+    """Post the whole run as one compact webhook call. Alerts are grouped
+    by (severity, code) into Slack blocks — a batch of repeated alerts
+    becomes a single 'x N' line instead of N attachments, so the payload
+    stays small and under Slack's truncation limit."""
     if not SLACK_WEBHOOK: return
-    
-    color = "#FF0000" if "RED" in summary else "#FFFF00"
-    payload = {
-        "text": f"*{summary}*",
-        "attachments": [{"color": color, "text": json.dumps(a['message']) for a in alerts}]
-    }
+
+    groups = {}
+    for a in alerts:
+        groups.setdefault((a['severity'], a['code']), []).append(a)
+
+    blocks = [{"type": "section", "text": {"type": "mrkdwn", "text": f"*{summary}*"}}]
+    for (severity, code), group in sorted(groups.items()):
+        blocks.append({
+            "type": "section",
+            "text": {"type": "mrkdwn",
+                     "text": f"*{code}* ({severity}) x{len(group)}: {group[0]['message']}"},
+        })
+
+    # Slack caps messages at 50 blocks; `text` is the notification fallback.
+    payload = {"text": summary, "blocks": blocks[:50]}
     try:
         requests.post(SLACK_WEBHOOK, json=payload, timeout=5)
         print("Slack alert sent.")
     except Exception as e:
         print(f"Failed to send Slack alert: {e}")
 
+def detect_anomalies(df, metric, thresh=3.0):
+    """Rows of df where `metric` deviates from its mean by more than
+    `thresh` standard deviations. Plain NumPy nanmean/nanstd plus one
+    boolean mask — no SciPy dependency, and NaN rows simply never flag
+    (a zscore-over-dropna approach yields positions into the dropped
+    array, silently mislabeling rows of the original frame)."""
+    x = df[metric].to_numpy(dtype=np.float64)
+    if len(x) == 0 or np.isnan(x).all():
+        return df.iloc[:0]
+    mu = np.nanmean(x)
+    sd = np.nanstd(x)
+    if sd == 0:
+        return df.iloc[:0]
+    mask = np.abs(x - mu) > thresh * sd
+    return df.iloc[np.flatnonzero(mask)]
+
 def save_artifacts(alerts, counts_df, output_dir):
     os.makedirs(output_dir, exist_ok=True)
-    pd.DataFrame(alerts).to_csv(os.path.join(output_dir, "monitor_alerts.csv"), index=False)
+    # The monitor hands over its dict-of-lists store, which builds columns
+    # directly; a plain list of alert dicts (batch aggregation) also works.
+    # details is already a JSON string column at this point.
+    alerts_df = pd.DataFrame(alerts)
+    alerts_df.to_parquet(
+        os.path.join(output_dir, "monitor_alerts.parquet"),
+        compression='zstd', engine='pyarrow')
     if counts_df is not None:
-        counts_df.to_csv(os.path.join(output_dir, "monitor_volume_stats.csv"), index=False)
+        # Flag outlier days (>3 sigma on row count) for downstream triage;
+        # the threshold checks themselves are unchanged.
+        flagged = detect_anomalies(counts_df, 'count')
+        counts_df = counts_df.assign(volume_anomaly=counts_df.index.isin(flagged.index))
+        counts_df.to_parquet(
+            os.path.join(output_dir, "monitor_volume_stats.parquet"),
+            compression='zstd', engine='pyarrow')
+
+def _load_gold(gold_file):
+    """Load the gold table (transform now writes Parquet; CSV still accepted)."""
+    if gold_file.endswith('.parquet'):
+        gold_df = pd.read_parquet(gold_file)
+    else:
+        gold_df = pa_csv.read_csv(gold_file).to_pandas()
+
+    # A handful of channel labels repeat across every row: as a categorical
+    # the business-logic groupby and membership checks compare int8 codes
+    # instead of strings. Categories come from the data itself — a fixed
+    # list would silently turn unexpected labels into NaN.
+    if 'last_click_channel' in gold_df.columns:
+        gold_df['last_click_channel'] = gold_df['last_click_channel'].astype('category')
+    return gold_df
+
+def _find_raw_files(raw_dir):
+    """List the raw event CSVs in raw_dir, oldest first, in one os.scandir
+    pass (prefix/suffix checks instead of fnmatch per entry). The full
+    sorted listing is kept on purpose: the 7-day rolling volume baseline
+    needs history, so a take-the-latest-file heuristic would break it.
+    Raises on an empty/missing directory so callers decide whether that is
+    fatal (single run) or just one bad pair (batch run)."""
+    try:
+        with os.scandir(raw_dir) as entries:
+            raw_files = sorted(
+                entry.path for entry in entries
+                if entry.name.startswith('events_') and entry.name.endswith('.csv'))
+    except FileNotFoundError:
+        raw_files = []
+    if not raw_files:
+        raise FileNotFoundError(f"No events_*.csv files found in {raw_dir}")
+    return raw_files
+
+def _load_inputs(raw_dir, gold_file):
+    """Load the gold table and every raw CSV under raw_dir."""
+    gold_df = _load_gold(gold_file)
+    raw_files = _find_raw_files(raw_dir)
+
+    # In production, we might only load the file for the specific date,
+    # but for this logic we load them all to calculate rolling averages.
+    # The Arrow reader parses in C++ threads and releases the GIL, so a
+    # thread pool overlaps files without pickling frames between
+    # processes; results come back in file order.
+    with ThreadPoolExecutor() as executor:
+        raw_dfs = list(executor.map(load_raw_file, raw_files))
+
+    return pd.concat(raw_dfs, ignore_index=True), gold_df
+
+def run_one(raw_dir, gold_file, check_date=None, output_dir=None, stream=False,
+            state_file=None):
+    """Load one (raw_dir, gold_file) pair, run the monitor and optionally
+    write its artifacts. Returns (status, alerts).
+
+    With stream=True the raw CSVs are reduced chunk by chunk into the
+    monitor's accumulators instead of being concatenated in memory —
+    same alerts, O(chunk) peak RSS for multi-GB event logs. With
+    state_file set, per-date counters persist across runs and the volume
+    baseline is computed from that history."""
+    if stream:
+        monitor = ProductionMonitor.streaming(_load_gold(gold_file), check_date=check_date,
+                                              state_file=state_file)
+        for path in _find_raw_files(raw_dir):
+            for chunk in iter_raw_chunks(path):
+                monitor.feed_chunk(chunk)
+        monitor.finalize_stream()
+    else:
+        raw_df, gold_df = _load_inputs(raw_dir, gold_file)
+        monitor = ProductionMonitor(raw_df, gold_df, check_date=check_date,
+                                    state_file=state_file)
+    status, alerts = monitor.run()
+    if output_dir:
+        save_artifacts(monitor._alert_cols, getattr(monitor, 'daily_counts', None), output_dir)
+    return status, alerts
+
+def _run_one_star(pair):
+    """ProcessPoolExecutor.map helper: unpack one pair dict. A pair that
+    fails to load reports RED instead of killing the whole sweep."""
+    try:
+        return run_one(**pair)
+    except Exception as e:
+        return "RED", [{
+            'timestamp': datetime.now().isoformat(),
+            'check_date': str(pair.get('check_date')),
+            'severity': 'P0',
+            'code': 'RUN_FAILURE',
+            'message': f"Monitor run failed for {pair.get('raw_dir')}: {e}",
+            'details': '{}',
+        }]
+
+def run_batch(pairs, workers=None):
+    """Monitor many (raw_dir, gold_file) pairs in one interpreter sweep.
+
+    Each entry in `pairs` is a dict of run_one kwargs. Pairs are
+    independent, so they fan out across a process pool — one pool for the
+    whole sweep amortizes interpreter startup and pandas import across N
+    days/tenants instead of paying it once per orchestrated invocation.
+    Results come back in input order as a list of (status, alerts).
+    """
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        return list(executor.map(_run_one_star, pairs))
 
 # ================= MAIN EXECUTION =================
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument("--raw_dir", required=True, help="Directory containing raw events_*.csv files")
-    parser.add_argument("--gold_file", required=True, help="Path to attribution csv")
+    parser.add_argument("--raw_dir", help="Directory containing raw events_*.csv files")
+    parser.add_argument("--gold_file", help="Path to attribution csv")
     parser.add_argument("--check_date", help="Specific date to check (YYYY-MM-DD). Defaults to latest gold date.")
     parser.add_argument("--output_dir", default="monitor_artifacts", help="Folder to save CSV logs")
-    
+    parser.add_argument("--batch", help="JSON file holding a list of {raw_dir, gold_file, check_date?, output_dir?} pairs")
+    parser.add_argument("--stream", action="store_true",
+                        help="Reduce raw CSVs chunk-by-chunk instead of loading them fully (bounded memory)")
+    parser.add_argument("--state_file",
+                        help="Parquet file persisting per-date counters across runs; the 7-day volume baseline then comes from this history")
+
     args = parser.parse_args()
 
-    # 1. Load Data
-    try:
-        # Load Gold
-        gold_df = pd.read_csv(args.gold_file)
-        
-        # Load Raw (Find all files in directory)
-        # Fix: use os.path.join for OS independence
-        search_path = os.path.join(args.raw_dir, "events_*.csv")
-        raw_files = sorted(glob.glob(search_path))
-        
-        if not raw_files:
-            print(f"[FATAL] No raw files found in {search_path}")
-            sys.exit(2)
-            
-        # In production, we might only load the file for the specific date, 
-        # but for this logic we load them all to calculate rolling averages.
-        raw_dfs = []
-        for f in raw_files:
-            df = pd.read_csv(f)
-            # Normalize schema drift immediately upon load to prevent false schema alerts
-            if 'clientId' in df.columns: df.rename(columns={'clientId': 'client_id'}, inplace=True)
-            raw_dfs.append(df)
-        
-        raw_df = pd.concat(raw_dfs, ignore_index=True)
+    # Batch mode: run every pair in one process-pool sweep and write a
+    # single aggregated alerts artifact for the lot.
+    if args.batch:
+        with open(args.batch) as fh:
+            pairs = json.load(fh)
+        results = run_batch(pairs)
+
+        for pair, (status, _) in zip(pairs, results):
+            print(f"{pair.get('raw_dir')} x {pair.get('gold_file')}: {status}")
+
+        all_alerts = [a for _, pair_alerts in results for a in pair_alerts]
+        if all_alerts:
+            os.makedirs(args.output_dir, exist_ok=True)
+            # details is already a JSON string column at alert creation
+            agg = pd.DataFrame(all_alerts)
+            agg.to_parquet(os.path.join(args.output_dir, "monitoring_alerts.parquet"),
+                           compression='zstd', engine='pyarrow')
+
+        statuses = [status for status, _ in results]
+        print(f"\nBATCH COMPLETE: {statuses.count('RED')} RED of {len(results)} pairs")
+        sys.exit(3 if "RED" in statuses else 0)
+
+    if not args.raw_dir or not args.gold_file:
+        parser.error("--raw_dir and --gold_file are required unless --batch is given")
 
+    # 1+2. Load Data & Run Monitor (artifacts written inside run_one)
+    try:
+        status, alerts = run_one(args.raw_dir, args.gold_file,
+                                 check_date=args.check_date,
+                                 output_dir=args.output_dir,
+                                 stream=args.stream,
+                                 state_file=args.state_file)
     except Exception as e:
         print(f"[FATAL] Failed to load data: {e}")
         sys.exit(2)
 
-    # 2. Run Monitor
-    monitor = ProductionMonitor(raw_df, gold_df, check_date=args.check_date)
-    status, alerts = monitor.run()
-
     # 3. Reporting
     print(f"\nFINAL STATUS: {status}")
     for a in alerts:
         print(f"[{a['severity']}] {a['message']}")
 
-    # 4. Save Artifacts
-    save_artifacts(alerts, getattr(monitor, 'daily_counts', None), args.output_dir)
-
-    # 5. Alerting & Exit
+    # 4. Alerting & Exit
+    # Post the webhook from a background thread so a stalled Slack endpoint
+    # overlaps with the final reporting instead of stalling it; the bounded
+    # join below (daemon thread) keeps process exit prompt regardless.
+    slack_thread = None
     if alerts:
-        send_slack_alert(f"Data Pipeline Status: {status}", alerts)
+        slack_thread = threading.Thread(
+            target=send_slack_alert,
+            args=(f"Data Pipeline Status: {status}", alerts),
+            daemon=True)
+        slack_thread.start()
+
+    if slack_thread is not None:
+        slack_thread.join(timeout=2.0)
 
     if status == "RED":
         print("🚨 CRITICAL FAILURE. Blocking Pipeline.")
@@ -1,5 +1,5 @@
 import pandas as pd
-from production_monitor import ProductionMonitor
+from monitor import ProductionMonitor, load_raw_file
 
 def make_raw(df_rows, date_str):
     df = pd.DataFrame(df_rows)
@@ -11,6 +11,20 @@ def make_gold(rows, conv_date):
     df['conversion_time'] = pd.to_datetime(conv_date)
     return df
 
+def test_load_raw_file_null_parity(tmp_path):
+    # Empty client_id fields must load as nulls, exactly as pandas reads
+    # them — otherwise the GHOST_USERS check silently reads a 0% null rate.
+    csv = tmp_path / "events_2025-03-04.csv"
+    csv.write_text(
+        "client_id,timestamp,event_name,page_url,referrer,event_data\n"
+        "u1,2025-03-04T00:00:00Z,page_view,/,ref,\n"
+        ",2025-03-04T00:01:00Z,page_view,/,ref,\n"
+        ",2025-03-04T00:02:00Z,page_view,/,ref,\n"
+    )
+    arrow_nulls = int(load_raw_file(str(csv))['client_id'].isna().sum())
+    pandas_nulls = int(pd.read_csv(csv)['client_id'].isna().sum())
+    assert arrow_nulls == pandas_nulls == 2
+
 def test_zero_revenue_blocks():
     raw = make_raw([{'client_id': 'u1', 'referrer':'a','page_url':'/'}], "2025-03-04T00:00:00Z")
     gold = make_gold([{'transaction_id': 't1', 'revenue': 0.0, 'last_click_channel': 'Organic'}], "2025-03-04T01:00:00Z")